@@ -0,0 +1,28 @@
+# aot_compile.py
+"""Ahead-of-time compile the PIV setup kernel with Numba.
+
+Run `python aot_compile.py` to build the `piv_kernel` extension next to this
+file. Besides `compute`, it exports `fingerprint()`, the kernel_fingerprint()
+of the source it was built from. camera_and_flow_setup only uses the prebuilt
+kernel when that matches the current setup_kernel, and otherwise falls back
+to JIT-compiling it on first use.
+"""
+
+import os
+from numba.pycc import CC
+from camera_and_flow_setup import KERNEL_SIGNATURE, kernel_fingerprint, setup_kernel
+
+FINGERPRINT = kernel_fingerprint()
+
+cc = CC("piv_kernel")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.export("compute", KERNEL_SIGNATURE)(setup_kernel)
+
+
+@cc.export("fingerprint", "i8()")
+def fingerprint():
+    return FINGERPRINT  # frozen into the build as a constant
+
+
+if __name__ == "__main__":
+    cc.compile()
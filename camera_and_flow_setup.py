@@ -1,123 +1,261 @@
 # camera_setup.py
 
-import numpy as np
+import math
 import datetime, os
+import hashlib, inspect, warnings
+from dataclasses import dataclass
+from pathlib import Path
 
-def calculate_camera_recording(
-    H_fov=(92 - 81) / 100,  # m, field of view height
-    z_fov=27.2,             # dimensionless (z/D0)
-    Q0=1.7,                 # L/min (primary jet)
-    Ry=1024,                # pixels (vertical resolution)
-    ds=16,                  # pixels (particle displacement)
-    D0=11/1000,             # m (primary nozzle diameter)
-    nu=1e-6,                # m2/s (kinematic viscosity)
-    dual_jet=False,         # flag for dual-jet setup
 
-    # Secondary jet parameters (only used if dual_jet=True)
-    Q1=0.55,                # L/min (secondary jet)
-    D1=1.3/1000,            # m (secondary nozzle diameter)
-    L_I=0.05,               # m (horizontal spacing)
-    H_I=0.10,               # m (vertical offset)
-    x_fov=7.5,              # dimensionless (x/D1)
+@dataclass(slots=True)
+class PIVResult:
+    """Computed PIV setup; secondary-jet fields stay None for a single jet."""
+    U0: float
+    Re0: float
+    Uc_ref: float
+    delta_t: float
+    fps: float
+    dominant_jet: str
+    U1: float | None = None
+    Re1: float | None = None
+    U1_U0: float | None = None
+    D0_D1: float | None = None
+    LI_D1: float | None = None
+    HI_D0: float | None = None
+    epsilon: float | None = None
 
-    experiment_name="single_jet_test",
-    generate_report=True,
-    output_dir="experiment_logs"
-):
-    """Calculate PIV setup and nondimensional parameters for single or dual jet experiments."""
+
+# --- Summary Report templates (filled with str.format_map) ---
+_HEADER_TMPL = (
+    "--- Experiment Setup Report ---\n"
+    "Date & Time: {now}\n"
+)
+
+_PRIMARY_TMPL = (
+    "Experiment: {experiment_name}\n"
+    + "=" * 40 + "\n"
+    "Input Parameters:\n"
+    "  H_fov     = {H_fov:.4f} m\n"
+    "  z_fov     = {z_fov:.2f} D0\n"
+    "  Ry        = {Ry} px\n"
+    "  ds        = {ds} px\n"
+    "  ν         = {nu:.2e} m²/s\n"
+    "\nPrimary Jet:\n"
+    "  Q₀        = {Q0:.2f} L/min\n"
+    "  D₀        = {D0_mm:.2f} mm\n"
+    "  U₀        = {U0:.4f} m/s\n"
+    "  U_c₀      = {Ucz0:.4f} m/s\n"
+    "  Re₀       = {Re0:.2f}\n"
+)
+
+_DUAL_TMPL = (
+    "\nSecondary Jet:\n"
+    "  x_fov     = {x_fov:.2f} D1\n"
+    "  Q₁        = {Q1:.2f} L/min\n"
+    "  D₁        = {D1_mm:.2f} mm\n"
+    "  U₁        = {U1:.4f} m/s\n"
+    "  U_c₁      = {Ucz1:.4f} m/s\n"
+    "  Re₁       = {Re1:.2f}\n"
+    "\nNon-Dimensional Ratios:\n"
+    "  U₁/U₀     = {U1_U0:.3f}\n"
+    "  D₀/D₁     = {D0_D1:.3f}\n"
+    "  Lᵢ/D₁     = {LI_D1:.3f}\n"
+    "  Hᵢ/D₀     = {HI_D0:.3f}\n"
+    "  ε (sqrt(D1/D0 * U0/U1)) = {eps:.3f}\n"
+)
+
+_TIMING_TMPL = (
+    "\nTiming Parameters (based on {dominant_jet} jet):\n"
+    "  Reference U_c = {U_ref:.4f} m/s\n"
+    "  Δt (interframe time) = {delta_t_us:.2f} μs\n"
+    "  Frame rate (fps)     = {sample_rate:.2f}\n"
+    + "=" * 40 + "\n"
+)
+
+
+# Numba signature of setup_kernel, shared with the AOT build in aot_compile.py
+KERNEL_SIGNATURE = "UniTuple(f8, 15)(f8, f8, f8, f8, f8, f8, f8, b1, f8, f8, f8, f8, f8)"
+
+
+# NOTE: the app may run a prebuilt copy of setup_kernel (see aot_compile.py).
+# Editing it changes kernel_fingerprint(), which makes the stale build fall back
+# to JIT; rerun `python aot_compile.py` to get the prebuilt speed-up back.
+def setup_kernel(H_fov, z_fov, Q0, Ry, ds, D0, nu, dual_jet, Q1, D1, L_I, H_I, x_fov):
+    """Scalar PIV setup math; returns a flat tuple of floats (dominant jet as 0.0/1.0)."""
 
     # --- Primary jet ---
-    U0 = 4 * Q0 / (1000 * 60 * np.pi * D0**2)
+    U0 = 4 * Q0 / (1000 * 60 * math.pi * D0*D0)
     Ucz0 = 5.8 * U0 / z_fov
     Re0 = U0 * D0 / nu
 
     # --- Dual jet setup ---
+    U1 = Re1 = U1_U0 = D0_D1 = LI_D1 = HI_D0 = eps = Ucz1 = 0.0
+    U_ref, dominant = Ucz0, 0.0
     if dual_jet:
-        U1 = 4 * Q1 / (1000 * 60 * np.pi * D1**2)
+        U1 = 4 * Q1 / (1000 * 60 * math.pi * D1*D1)
         Re1 = U1 * D1 / nu
         U1_U0 = U1 / U0
         D0_D1 = D0 / D1
         LI_D1 = L_I / D1
         HI_D0 = H_I / D0
-        eps = np.sqrt(D1/D0 * U0/U1)
+        eps = math.sqrt(D1/D0 * U0/U1)
 
         # Determine dominant jet (based on higher velocity)
         Ucz1 = 5.8 * U1 / x_fov
         if Ucz1 > Ucz0:
-            U_ref, dominant_jet = Ucz1, "Secondary"
-        else:
-            U_ref, dominant_jet = Ucz0, "Primary"
-    else:
-        U1 = Re1 = U1_U0 = D0_D1 = LI_D1 = HI_D0 = eps = None
-        U_ref, dominant_jet = Ucz0, "Primary"
+            U_ref, dominant = Ucz1, 1.0
 
     # --- Timing calculations ---
     delta_t = ds * H_fov / (Ry * U_ref)
     sample_rate = 1 / delta_t
 
-    # --- Summary Report ---
-    summary = (
-        f"--- Experiment Setup Report ---\n"
-        f"Date & Time: {datetime.datetime.now()}\n"
-        f"Experiment: {experiment_name}\n"
-        f"{'='*40}\n"
-        f"Input Parameters:\n"
-        f"  H_fov     = {H_fov:.4f} m\n"
-        f"  z_fov     = {z_fov:.2f} D0\n"
-        f"  Ry        = {Ry} px\n"
-        f"  ds        = {ds} px\n"
-        f"  ν         = {nu:.2e} m²/s\n"
-        f"\nPrimary Jet:\n"
-        f"  Q₀        = {Q0:.2f} L/min\n"
-        f"  D₀        = {D0*1000:.2f} mm\n"
-        f"  U₀        = {U0:.4f} m/s\n"
-        f"  U_c₀      = {Ucz0:.4f} m/s\n"
-        f"  Re₀       = {Re0:.2f}\n"
-    )
+    return (U0, Ucz0, Re0, U1, Re1, U1_U0, D0_D1, LI_D1, HI_D0, eps,
+            Ucz1, U_ref, dominant, delta_t, sample_rate)
 
-    if dual_jet:
-        summary += (
-            f"\nSecondary Jet:\n"
-            f"  x_fov     = {x_fov:.2f} D1\n"
-            f"  Q₁        = {Q1:.2f} L/min\n"
-            f"  D₁        = {D1*1000:.2f} mm\n"
-            f"  U₁        = {U1:.4f} m/s\n"
-            f"  U_c₁      = {Ucz1:.4f} m/s\n"
-            f"  Re₁       = {Re1:.2f}\n"
-            f"\nNon-Dimensional Ratios:\n"
-            f"  U₁/U₀     = {U1_U0:.3f}\n"
-            f"  D₀/D₁     = {D0_D1:.3f}\n"
-            f"  Lᵢ/D₁     = {LI_D1:.3f}\n"
-            f"  Hᵢ/D₀     = {HI_D0:.3f}\n"
-            f"  ε (sqrt(D1/D0 * U0/U1)) = {eps:.3f}\n"
+
+def kernel_fingerprint():
+    """Hash of setup_kernel's source and signature (non-negative int64), to detect stale AOT builds."""
+    source = inspect.getsource(setup_kernel) + KERNEL_SIGNATURE
+    return int.from_bytes(hashlib.sha256(source.encode("utf-8")).digest()[:8], "little") >> 1
+
+
+try:
+    # Prebuilt by `python aot_compile.py`: no compile cost on the first call
+    import piv_kernel
+except ImportError:
+    piv_kernel = None
+
+if piv_kernel is not None and getattr(piv_kernel, "fingerprint", lambda: None)() == kernel_fingerprint():
+    _kernel = piv_kernel.compute
+else:
+    if piv_kernel is not None:
+        warnings.warn("piv_kernel does not match setup_kernel; using JIT instead. "
+                      "Rerun `python aot_compile.py` to rebuild it.")
+    # numba is only imported here, so the prebuilt path never pays for it
+    from numba import njit
+    _kernel = njit(cache=True)(setup_kernel)
+
+
+def compute_camera_recording(
+    H_fov, z_fov, Q0, Ry, ds, D0, nu, dual_jet,
+    Q1, D1, L_I, H_I, x_fov,
+    experiment_name, return_summary=True,
+):
+    """Compute PIV setup and summary text without touching the filesystem.
+
+    Pure function of its inputs, so callers (e.g. the Streamlit app) can cache it.
+    Returns (results, summary); summary is None when return_summary is False.
+    The summary has no dated header (that would make the result depend on the
+    clock); add it with stamp_summary before saving or showing the report.
+    """
+    if not dual_jet:
+        # Secondary inputs are unused; keep the kernel signature all-float
+        Q1 = D1 = L_I = H_I = x_fov = 0.0
+
+    # Plain Python floats keep arithmetic off NumPy scalars and give the
+    # compiled kernel a single float64 signature (Ry/ds often arrive as int)
+    primary = [float(v) for v in (H_fov, z_fov, Q0, Ry, ds, D0, nu)]
+    secondary = [float(v) for v in (Q1, D1, L_I, H_I, x_fov)]
+    (U0, Ucz0, Re0, U1, Re1, U1_U0, D0_D1, LI_D1, HI_D0, eps,
+     Ucz1, U_ref, dominant, delta_t, sample_rate) = _kernel(*primary, bool(dual_jet), *secondary)
+    dominant_jet = "Secondary" if dominant else "Primary"
+
+    # --- Summary Report (only formatted when someone will read it) ---
+    summary = None
+    if return_summary:
+        fields = dict(
+            experiment_name=experiment_name,
+            H_fov=H_fov, z_fov=z_fov, Ry=Ry, ds=ds, nu=nu,
+            Q0=Q0, D0_mm=D0*1000, U0=U0, Ucz0=Ucz0, Re0=Re0,
+            x_fov=x_fov, Q1=Q1, D1_mm=D1*1000, U1=U1, Ucz1=Ucz1, Re1=Re1,
+            U1_U0=U1_U0, D0_D1=D0_D1, LI_D1=LI_D1, HI_D0=HI_D0, eps=eps,
+            dominant_jet=dominant_jet, U_ref=U_ref,
+            delta_t_us=delta_t*1e6, sample_rate=sample_rate,
         )
+        summary = _PRIMARY_TMPL.format_map(fields)
+        if dual_jet:
+            summary += _DUAL_TMPL.format_map(fields)
+        summary += _TIMING_TMPL.format_map(fields)
 
-    summary += (
-        f"\nTiming Parameters (based on {dominant_jet} jet):\n"
-        f"  Reference U_c = {U_ref:.4f} m/s\n"
-        f"  Δt (interframe time) = {delta_t*1e6:.2f} μs\n"
-        f"  Frame rate (fps)     = {sample_rate:.2f}\n"
-        f"{'='*40}\n"
+    # Return results
+    secondary = dict(
+        U1=U1, Re1=Re1, U1_U0=U1_U0,
+        D0_D1=D0_D1, LI_D1=LI_D1, HI_D0=HI_D0, epsilon=eps
+    ) if dual_jet else {}
+    results = PIVResult(
+        U0=U0, Re0=Re0, Uc_ref=U_ref,
+        delta_t=delta_t, fps=sample_rate, dominant_jet=dominant_jet,
+        **secondary
     )
 
-    # Save report
-    if generate_report:
+    return results, summary
+
+
+def stamp_summary(summary, timestamp=None):
+    """Prefix a summary from compute_camera_recording with the dated report header."""
+    now = (timestamp or datetime.datetime.now()).isoformat(sep=" ", timespec="seconds")
+    return _HEADER_TMPL.format(now=now) + summary
+
+
+# Report directories already created this session (skips a makedirs per save)
+_DIRS_SEEN = set()
+
+
+def save_report(summary, experiment_name, output_dir="experiment_logs", timestamp=None):
+    """Write a summary report to a timestamped text file and return its path."""
+    if output_dir not in _DIRS_SEEN:
+        os.makedirs(output_dir, exist_ok=True)
+        _DIRS_SEEN.add(output_dir)
+    now = timestamp or datetime.datetime.now()
+    fname = f"{experiment_name}_{now.strftime('%Y%m%d_%H%M%S')}.txt"
+    path = os.path.join(output_dir, fname)
+    try:
+        Path(path).write_text(summary, encoding="utf-8")
+    except FileNotFoundError:
+        # Directory was removed while the process was running; recreate it once
         os.makedirs(output_dir, exist_ok=True)
-        fname = f"{experiment_name}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        with open(os.path.join(output_dir, fname), "w", encoding="utf-8") as f:
-            f.write(summary)
-        print(f"Report saved: {os.path.join(output_dir, fname)}")
+        Path(path).write_text(summary, encoding="utf-8")
+    print(f"Report saved: {path}")
+    return path
 
-    # Return results
-    results = {
-        "U0": U0, "Re0": Re0, "Uc_ref": U_ref,
-        "delta_t": delta_t, "fps": sample_rate, "dominant_jet": dominant_jet
-    }
 
-    if dual_jet:
-        results.update({
-            "U1": U1, "Re1": Re1, "U1/U0": U1_U0,
-            "D0/D1": D0_D1, "LI/DI": LI_D1, "HI/D)": HI_D0, "epsilon": eps
-        })
+def calculate_camera_recording(
+    H_fov=(92 - 81) / 100,  # m, field of view height
+    z_fov=27.2,             # dimensionless (z/D0)
+    Q0=1.7,                 # L/min (primary jet)
+    Ry=1024,                # pixels (vertical resolution)
+    ds=16,                  # pixels (particle displacement)
+    D0=11/1000,             # m (primary nozzle diameter)
+    nu=1e-6,                # m2/s (kinematic viscosity)
+    dual_jet=False,         # flag for dual-jet setup
+
+    # Secondary jet parameters (only used if dual_jet=True)
+    Q1=0.55,                # L/min (secondary jet)
+    D1=1.3/1000,            # m (secondary nozzle diameter)
+    L_I=0.05,               # m (horizontal spacing)
+    H_I=0.10,               # m (vertical offset)
+    x_fov=7.5,              # dimensionless (x/D1)
 
+    experiment_name="single_jet_test",
+    generate_report=True,
+    output_dir="experiment_logs",
+    return_summary=True
+):
+    """Calculate PIV setup and nondimensional parameters for single or dual jet experiments.
+
+    Returns (results, summary) so callers can reuse the formatted report
+    instead of rebuilding it; summary is None only when both
+    generate_report and return_summary are False.
+    """
+    now = datetime.datetime.now()  # shared by the report header and filename
+    results, summary = compute_camera_recording(
+        H_fov=H_fov, z_fov=z_fov, Q0=Q0, Ry=Ry, ds=ds, D0=D0, nu=nu,
+        dual_jet=dual_jet, Q1=Q1, D1=D1, L_I=L_I, H_I=H_I, x_fov=x_fov,
+        experiment_name=experiment_name,
+        return_summary=generate_report or return_summary,
+    )
+    if summary is not None:
+        summary = stamp_summary(summary, now)
+    if generate_report:
+        save_report(summary, experiment_name, output_dir, timestamp=now)
     return results, summary
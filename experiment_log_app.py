@@ -1,8 +1,24 @@
 import streamlit as st
+import datetime
 import numpy as np
-import matplotlib.pyplot as plt
-plt.style.use('classic')  # nicer background
-from camera_and_flow_setup import calculate_camera_recording
+from dataclasses import asdict
+from camera_and_flow_setup import compute_camera_recording, save_report, stamp_summary
+
+# Reruns with unchanged inputs are served from memory instead of recomputing.
+# The cached summary has no date; it is stamped fresh on every submit.
+@st.cache_data(show_spinner=False)
+def cached_camera_recording(**params):
+    return compute_camera_recording(**params)
+
+@st.cache_data(show_spinner=False)
+def build_plot_arrays(ds, H_fov, Ry, U_c, delta_t_fixed):
+    sweep = np.linspace(0.5, 2, 25)           # shared 0.5x..2x grid
+    ds_range = sweep * ds                     # vary displacement
+    U_range = sweep * U_c                     # vary velocity
+    delta_t = ds_range * (H_fov / (Ry * U_c))  # d_s vs delta t at given U_c
+    fps = np.reciprocal(delta_t)               # d_s vs fps at given U_c
+    ds_vs_U = U_range * (delta_t_fixed * Ry / H_fov)  # d_s fixed vs U_c
+    return ds_range, U_range, delta_t, fps, ds_vs_U
 
 st.title("Dual / Single Jet PIV Setup Calculator")
 
@@ -16,28 +32,35 @@ It provides **interactive plots** showing particle displacement ($\delta_s$) vs
 
 # Sidebar Inputs
 st.sidebar.header("Experiment Settings")
-experiment_name = st.sidebar.text_input("Experiment Name", "dual_jet_test")
+# Kept outside the form: toggling it must rerun to show/hide the secondary inputs
 dual_jet = st.sidebar.checkbox("Dual Jet Configuration", value=False)
 
-with st.sidebar.expander("Primary Jet Parameters", expanded=True):
-    H_fov = st.number_input("Field of view height (m)", value=(92-81)/100)
-    z_fov = st.number_input(r"$z_{\rm fov}$ ($D_0$ units)", value=27.2)
-    Q0 = st.number_input("Primary flow rate $Q_0$ (L/min)", value=1.7)
-    D0 = st.number_input("Primary nozzle diameter $D_0$ (m)", value=11/1000)
-    Ry = st.number_input("Vertical resolution $R_y$ (px)", value=1024)
-    ds = st.number_input(r"Particle displacement $\delta_s$ (px)", value=16)
-    nu = st.number_input(r"Kinematic viscosity $\nu \rm (m^2/s)$", value=1e-6, format="%.3g")
-
-if dual_jet:
-    with st.sidebar.expander("Secondary Jet Parameters", expanded=True):
-        Q1 = st.number_input("Secondary flow rate $Q_1$ (L/min)", value=0.55)
-        D1 = st.number_input("Secondary nozzle diameter $D_1$ (m)", value=1.3/1000, format="%.3g")
-        L_I = st.number_input("Horizontal spacing $L_I$ (m)", value=0.05, format="%.3g")
-        H_I = st.number_input("Vertical offset $H_I$ (m)", value=0.10)
-        x_fov = st.number_input(r"$x_{\rm fov}$ ($D_1$ units)", value=7.5)
-
-if st.button("Compute Setup"):
-    results, summary = calculate_camera_recording(
+# Inputs are batched in a form, so editing them does not rerun the script until submit
+with st.sidebar.form("piv_params"):
+    experiment_name = st.text_input("Experiment Name", "dual_jet_test")
+    save_to_disk = st.checkbox("Save report to experiment_logs/", value=False)
+
+    with st.expander("Primary Jet Parameters", expanded=True):
+        H_fov = st.number_input("Field of view height (m)", value=(92-81)/100)
+        z_fov = st.number_input(r"$z_{\rm fov}$ ($D_0$ units)", value=27.2)
+        Q0 = st.number_input("Primary flow rate $Q_0$ (L/min)", value=1.7)
+        D0 = st.number_input("Primary nozzle diameter $D_0$ (m)", value=11/1000)
+        Ry = st.number_input("Vertical resolution $R_y$ (px)", value=1024)
+        ds = st.number_input(r"Particle displacement $\delta_s$ (px)", value=16)
+        nu = st.number_input(r"Kinematic viscosity $\nu \rm (m^2/s)$", value=1e-6, format="%.3g")
+
+    if dual_jet:
+        with st.expander("Secondary Jet Parameters", expanded=True):
+            Q1 = st.number_input("Secondary flow rate $Q_1$ (L/min)", value=0.55)
+            D1 = st.number_input("Secondary nozzle diameter $D_1$ (m)", value=1.3/1000, format="%.3g")
+            L_I = st.number_input("Horizontal spacing $L_I$ (m)", value=0.05, format="%.3g")
+            H_I = st.number_input("Vertical offset $H_I$ (m)", value=0.10)
+            x_fov = st.number_input(r"$x_{\rm fov}$ ($D_1$ units)", value=7.5)
+
+    submitted = st.form_submit_button("Compute Setup")
+
+if submitted:
+    results, summary_body = cached_camera_recording(
         H_fov=H_fov, z_fov=z_fov, Q0=Q0, Ry=Ry, ds=ds, D0=D0, nu=nu,
         dual_jet=dual_jet,
         Q1=Q1 if dual_jet else None,
@@ -45,14 +68,17 @@ if st.button("Compute Setup"):
         L_I=L_I if dual_jet else None,
         H_I=H_I if dual_jet else None,
         x_fov=x_fov if dual_jet else None,
-        experiment_name=experiment_name,
-        generate_report=True
+        experiment_name=experiment_name
     )
+    now = datetime.datetime.now()  # shared by the report header and filename
+    summary = stamp_summary(summary_body, now) if summary_body is not None else None
     st.success("Setup computed successfully!")
+    if save_to_disk:
+        st.info(f"Report saved: {save_report(summary, experiment_name, timestamp=now)}")
     
     st.markdown("<h3 style='color:darkblue'>Calculated Parameters</h3>", unsafe_allow_html=True)
     # st.subheader("Calculated Parameters")
-    st.table(results)
+    st.table({k: v for k, v in asdict(results).items() if v is not None})
     
     # --- LaTeX Notes ---
     st.markdown("**Notes:**")
@@ -61,49 +87,44 @@ if st.button("Compute Setup"):
     
     # --- PIV Plots ---
     st.markdown("<h3 style='color:darkblue'>PIV Parameter Plots</h3>", unsafe_allow_html=True)
-    U_c = results['Uc_ref']
-
-    ds_range = np.linspace(ds*0.5, ds*2, 50)  # vary displacement
-    U_range = np.linspace(U_c*0.5, U_c*2, 50) # vary velocity
-    
-    # 1️d_s vs delta t at given U_c
-    # delta_t = ds_range / U_c
-    delta_t = ds_range * H_fov / (Ry * U_c)
-    fig1, ax1 = plt.subplots(figsize=(6,4))
-    ax1.plot(ds_range, delta_t, 'b-o')
-    ax1.set_xlabel(r"$\delta_s$ (px)"); ax1.set_ylabel(r"$\Delta t$ (s)")
-    ax1.set_title(r"Particle displacement $\delta_s$ vs Time Interval $\Delta t$")
-    ax1.grid(True); st.pyplot(fig1)
-    
-    # d_s vs fps at given U_c
-    fps = 1 / (delta_t)
-    fig2, ax2 = plt.subplots(figsize=(6,4))
-    ax2.plot(ds_range, fps, 'r-o')
-    ax2.set_xlabel("$d_s$ (px)"); ax2.set_ylabel(r"$\omega$ (fps)")
-    ax2.set_title(r"Particle displacement $\delta_s$ vs Sampling Rate (fps)")
-    ax2.grid(True); st.pyplot(fig2)
-    
-    # d_s fixed vs U_c
-    delta_t_fixed = results['delta_t'] #ds / U_range
-    ds = delta_t_fixed * Ry * U_range/ H_fov
-    fig3, ax3 = plt.subplots(figsize=(6,4))
-    ax3.plot(U_range, ds, 'g-', label=rf"$\Delta t = {delta_t_fixed:.3g} s$")
-    ax3.set_xlabel("$U_c$ (m/s)"); ax3.set_ylabel(r"$\delta s = \frac{\Delta t\cdot R_y \cdot U_c}{H_{\rm fov}}$")
-    ax3.set_title(r"Particle displacement $\delta_s$ vs Flow Velocity $U_c$")
-    ax3.legend(); ax3.grid(True); st.pyplot(fig3)
+    U_c = results.Uc_ref
+    delta_t_fixed = results.delta_t
+    ds_range, U_range, delta_t, fps, ds_vs_U = build_plot_arrays(ds, H_fov, Ry, U_c, delta_t_fixed)
 
-    # Create a download button
-    st.markdown("""
-    To save the result as a txt file, please click below.
-    """)
-    st.download_button(
-        label="📥 Download Experiment Report",
-        data=summary,  # this can also be bytes or CSV
-        file_name=f"{experiment_name}_report.txt",
-        mime="text/plain"
-    )
+    # Charts are rendered client-side from the data, no server-side rasterization.
+    # Plotting libraries are imported lazily to keep the first page load fast.
+    import pandas as pd
+    import altair as alt
 
+    ds_index = pd.Index(ds_range, name="δs (px)")
 
+    # d_s vs delta t at given U_c
+    st.caption(r"Particle displacement $\delta_s$ vs Time Interval $\Delta t$")
+    st.line_chart(pd.DataFrame({"Δt (s)": delta_t}, index=ds_index))
 
+    # d_s vs fps at given U_c
+    st.caption(r"Particle displacement $\delta_s$ vs Sampling Rate (fps)")
+    st.line_chart(pd.DataFrame({"ω (fps)": fps}, index=ds_index), color="#d62728")
 
+    # d_s fixed vs U_c
+    st.caption(r"Particle displacement $\delta_s$ vs Flow Velocity $U_c$")
+    df3 = pd.DataFrame({"U_c": U_range, "ds": ds_vs_U, "label": f"Δt = {delta_t_fixed:.3g} s"})
+    st.altair_chart(
+        alt.Chart(df3).mark_line().encode(
+            x=alt.X("U_c", title="U_c (m/s)"),
+            y=alt.Y("ds", title="δs = Δt·R_y·U_c / H_fov (px)"),
+            color=alt.Color("label", title=None, scale=alt.Scale(range=["green"])),
+        )
+    )
 
+    # Create a download button
+    if summary is not None:
+        st.markdown("""
+        To save the result as a txt file, please click below.
+        """)
+        st.download_button(
+            label="📥 Download Experiment Report",
+            data=summary,  # this can also be bytes or CSV
+            file_name=f"{experiment_name}_report.txt",
+            mime="text/plain"
+        )